@@ -66,6 +66,7 @@ if __name__ == "__main__":
     parser.add_argument('--limit', nargs='?', default=100000, help="Limit to number of IPs parsed from file")
     parser.add_argument('--store', nargs='?', default=True, help="Save results to disk? (JSON file)")
     args = parser.parse_args()
+    utils.setup_logging()
     filename = args.filename
     limit = int(args.limit)
     store = bool(args.store)
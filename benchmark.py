@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+__author__ = 'Zach Dischner'
+__copyright__ = ""
+__credits__ = ["NA"]
+__license__ = "NA"
+__version__ = "0.0.0"
+__maintainer__ = "Zach Dischner"
+__email__ = "zach.dischner@gmail.com"
+__status__ = "Dev"
+__doc__ = """
+File name: benchmark.py
+Created: Oct 19 2026
+Modified: Oct 19 2026
+
+Summary:
+    Small benchmarks for the IPDetective modules.
+
+Details:
+    `startup` times fresh interpreter launches of the lightweight CLI paths (which is how
+    they get used from shell pipelines) and reports whether any heavy dependency got
+    imported along the way. Each command is run `repeat` times and the best/median wall
+    times are reported, with a bare `python -c pass` launch as the floor.
+
+    `memory` compares the retained size of a synthetic database (`synthetic_db()`) held as
+    plain parsed JSON dicts vs a `utils.IPStore`, measured with `tracemalloc`.
+
+    `groupby` times `ipfilter.IPMeta.group_by()` summary reports over a synthetic dataset.
+
+    `spatial` times building a `geoindex.GeoIndex` over random points on the globe, and
+    bounding-box, radius and k-nearest queries against it.
+
+Examples:
+    python benchmark.py startup --repeat 20
+    python benchmark.py memory --size 200000
+    python benchmark.py groupby --size 1000000
+    python benchmark.py spatial --size 5000000
+
+"""
+
+###############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import os
+import sys
+import gc
+import json
+import time
+import random
+import statistics
+import subprocess
+import tracemalloc
+import argparse
+import utils
+
+###### Module Wide Objects
+_here = os.path.dirname(os.path.realpath(__file__))
+_HEAVY = ("numpy", "pandas", "requests")
+
+## Name: python arguments for each startup path we care about
+_STARTUP_CMDS = {
+    "interpreter": ["-c", "pass"],
+    "import ipparser": ["-c", "import ipparser"],
+    "import ipinfo": ["-c", "import ipinfo"],
+    "import ipfilter": ["-c", "import ipfilter"],
+    "ipparser CLI --limit 5": ["ipparser.py", os.path.join(_here, "list_of_ips.txt"), "--limit", "5"],
+}
+
+## Arguments for each `IPMeta.group_by()` report we time
+_REPORTS = [("country_name", {}), ("name", {"top": 20}), ("/24", {}), ("/24/48", {"top": 20}),
+            ("region_name", {"distinct": "handle"})]
+
+## Spatial queries we time: (method name, arguments)
+_SPATIAL_QUERIES = [("bbox", (37, 41, -109.05, -102.05)), ("bbox", (-10, 10, 170, -170)),
+                    ("radius", (39.7392, -104.9903, 50)), ("radius", (35.6762, 139.6503, 500)),
+                    ("nearest", (39.7392, -104.9903, 10)), ("nearest", (-33.8688, 151.2093, 1000))]
+
+## Value pools for synthetic GEO records: (country_code, country_name, region_name, city, time_zone, latitude, longitude)
+_PLACES = [("US", "United States", "Colorado", "Denver", "America/Denver", 39.7392, -104.9903),
+           ("US", "United States", "California", "San Jose", "America/Los_Angeles", 37.3382, -121.8863),
+           ("US", "United States", "Virginia", "Ashburn", "America/New_York", 39.0438, -77.4874),
+           ("VN", "Vietnam", "Ho Chi Minh", "Ho Chi Minh City", "Asia/Ho_Chi_Minh", 10.8231, 106.6297),
+           ("DE", "Germany", "Hesse", "Frankfurt", "Europe/Berlin", 50.1109, 8.6821),
+           ("JP", "Japan", "Tokyo", "Tokyo", "Asia/Tokyo", 35.6762, 139.6503),
+           ("BR", "Brazil", "Sao Paulo", "Sao Paulo", "America/Sao_Paulo", -23.5505, -46.6333),
+           ("AU", "Australia", "New South Wales", "Sydney", "Australia/Sydney", -33.8688, 151.2093)]
+_ORGS = ["Level 3 Communications", "Comcast Cable", "Amazon Technologies", "Google LLC",
+         "Viettel Group", "Deutsche Telekom AG", "NTT Communications", "Telstra"]
+
+###############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def synthetic_db(size, seed=0, v6_fraction=0.2):
+    """Build a synthetic {ip: {"GEO":geo, "RDAP":rdap}} database of `size` IPs, shaped like fetched metadata
+
+    IPs are grouped into networks (a /16 for IPv4, a /32 for IPv6) that share RDAP data, GEO
+    locations are jittered around a handful of places. Every record is its own object, like
+    parsed JSON would be.
+    """
+    rng = random.Random(seed)
+    data = {}
+    while len(data) < size:
+        if rng.random() < v6_fraction:
+            net = rng.randrange(64)
+            ip = utils.canonical_ip(f"2001:{net:x}::{rng.randrange(1 << 16):x}:{rng.randrange(1 << 16):x}")
+            start, end, version = f"2001:{net:x}::", f"2001:{net:x}:ffff:ffff:ffff:ffff:ffff:ffff", "v6"
+        else:
+            net = rng.randrange(1, 224)
+            ip = f"{net}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+            start, end, version = f"{net}.0.0.0", f"{net}.255.255.255", "v4"
+        org = _ORGS[net % len(_ORGS)]
+        code, country, region, city, zone, lat, lon = _PLACES[(net * 7 + rng.randrange(2)) % len(_PLACES)]
+        geo = {"ip": ip, "country_code": code, "country_name": country, "region_code": region[:2].upper(),
+               "region_name": region, "city": city, "zip_code": "", "time_zone": zone,
+               "latitude": round(lat + rng.uniform(-0.5, 0.5), 4),
+               "longitude": round(lon + rng.uniform(-0.5, 0.5), 4), "metro_code": 0}
+        rdap = {"objectClassName": "ip network", "handle": f"NET-{version}-{net}", "startAddress": start,
+                "endAddress": end, "ipVersion": version, "name": org.upper().replace(" ", "-"),
+                "type": "ALLOCATION", "country": code, "parentHandle": f"NET-{version}-0",
+                "entities": [{"objectClassName": "entity", "handle": f"ORG-{net}", "roles": ["registrant"],
+                              "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", org]]]}],
+                "remarks": [{"title": "Registration Comments",
+                             "description": [f"Addresses within this block are registered to {org}.",
+                                             "Abuse reports should be sent to the listed abuse contact."]}],
+                "links": [{"value": f"https://rdap.arin.net/registry/ip/{start}", "rel": "self",
+                           "href": f"https://rdap.arin.net/registry/ip/{start}"}],
+                "events": [{"eventAction": "registration", "eventDate": "2001-02-03T00:00:00-05:00"}],
+                "port43": "whois.arin.net", "ip": ip}
+        data[ip] = {"GEO": geo, "RDAP": rdap}
+    return data
+
+def retained_size(build):
+    """Bytes still allocated after calling `build()`, holding on to what it returns"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, result
+
+def memory(size=100000):
+    """Print retained memory of a synthetic database as plain dicts vs an `IPStore`"""
+    serialized = json.dumps(synthetic_db(size))
+    plain, _ = retained_size(lambda: json.loads(serialized))
+    compact, store = retained_size(lambda: utils.IPStore.from_dict(json.loads(serialized)))
+    print(f"Synthetic database of {size} IPs ({store.stats()})")
+    print(f"{'plain dicts':<14}{plain/2**20:>10.1f} MB{plain/size:>10.0f} B/ip")
+    print(f"{'IPStore':<14}{compact/2**20:>10.1f} MB{compact/size:>10.0f} B/ip")
+    print(f"Reduction: {plain/compact:.1f}x")
+    return 0
+
+def groupby(size=100000):
+    """Print timings of summary reports over a synthetic dataset"""
+    import ipfilter
+    ipmeta = ipfilter.IPMeta(data=synthetic_db(size))
+    print(f"{ipmeta}")
+    for key, kwargs in _REPORTS:
+        start = time.perf_counter()
+        report = ipmeta.group_by(key, **kwargs)
+        print(f"group_by({key!r}, {kwargs}): {len(report)} groups in {(time.perf_counter() - start)*1e3:.0f} ms")
+    return 0
+
+def spatial(size=1000000, repeat=10):
+    """Print timings of spatial index build and queries over `size` random points"""
+    import numpy as np
+    import geoindex
+    rng = np.random.RandomState(0)
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, size)))  # Uniform over the sphere
+    lon = rng.uniform(-180, 180, size)
+
+    start = time.perf_counter()
+    index = geoindex.GeoIndex(lat, lon)
+    print(f"{index} built in {(time.perf_counter() - start)*1e3:.0f} ms")
+    for method, args in _SPATIAL_QUERIES:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            found = getattr(index, method)(*args)
+            times.append(time.perf_counter() - start)
+        count = len(found[0]) if isinstance(found, tuple) else len(found)
+        print(f"{method}{args}: {count} points, best {min(times)*1e3:.2f} ms")
+    return 0
+
+def time_command(args, repeat=10):
+    """Run `python *args` `repeat` times from this directory, return list of wall times in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + list(args), cwd=_here,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+def heavy_imports(module):
+    """Import `module` in a fresh interpreter, return the heavy dependencies that got pulled in"""
+    code = f"import sys, {module}; print(' '.join(m for m in {_HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=_here, check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return out.split()
+
+def startup(repeat=10):
+    """Print startup timings for each CLI path"""
+    print(f"{'path':<26}{'best [ms]':>12}{'median [ms]':>14}")
+    for name, args in _STARTUP_CMDS.items():
+        times = time_command(args, repeat=repeat)
+        print(f"{name:<26}{min(times)*1e3:>12.1f}{statistics.median(times)*1e3:>14.1f}")
+
+    for module in ("utils", "ipparser", "ipinfo", "ipfilter"):
+        loaded = heavy_imports(module)
+        print(f"import {module}: heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+    return 0
+
+##############################################################################
+#                             Runtime Execution
+# ----------*----------*----------*----------*----------*----------*----------*
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark IPDetective modules',
+                    epilog='Example of use: python benchmark.py startup --repeat 20')
+    parser.add_argument('bench', choices=['startup', 'memory', 'groupby', 'spatial'], help="Which benchmark to run")
+    parser.add_argument('--repeat', nargs='?', default=10, help="Number of repetitions per measurement")
+    parser.add_argument('--size', nargs='?', default=100000, help="Number of IPs in synthetic datasets")
+    args = parser.parse_args()
+    if args.bench == 'memory':
+        sys.exit(memory(size=int(args.size)))
+    if args.bench == 'groupby':
+        sys.exit(groupby(size=int(args.size)))
+    if args.bench == 'spatial':
+        sys.exit(spatial(size=int(args.size), repeat=int(args.repeat)))
+    sys.exit(startup(repeat=int(args.repeat)))
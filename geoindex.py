@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+__author__ = 'Zach Dischner'
+__copyright__ = ""
+__credits__ = ["NA"]
+__license__ = "NA"
+__version__ = "0.0.0"
+__maintainer__ = "Zach Dischner"
+__email__ = "zach.dischner@gmail.com"
+__status__ = "Dev"
+__doc__ = """
+File name: geoindex.py
+Created: Oct 19 2026
+Modified: Oct 19 2026
+
+Summary:
+    Grid based spatial index over latitude/longitude points, for bounding-box, radius and
+    k-nearest queries. Used by `ipfilter.IPMeta` on GEO metadata.
+
+Details:
+    Points are bucketed into square `cell_deg` degree cells and sorted by cell id (row-major,
+    rows of latitude), so each row of cells a query touches is one contiguous slice found by
+    binary search. Candidates from those slices are then checked exactly, all with NumPy.
+
+    * Bounding boxes may cross the antimeridian (lon_min > lon_max)
+    * Radius queries search the bounding box of the circle, then filter by haversine distance
+    * k-nearest queries grow a radius search until it holds at least k points
+
+Examples:
+    index = GeoIndex(latitudes, longitudes)
+    index.bbox(39, 41, -106, -104)                  # Positions of points in the box
+    positions, km = index.radius(39.74, -104.99, 50) # Points within 50 km, and their distances
+    positions, km = index.nearest(39.74, -104.99, k=10)
+
+"""
+
+###############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import utils
+
+###### Module Wide Objects
+np = utils.lazy_import("numpy")
+EARTH_RADIUS_KM = 6371.0088  # Mean earth radius
+
+###############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def haversine(lat1, lon1, lat2, lon2):
+    """Great circle distance in km between points given in degrees. Vectorized over NumPy arrays
+
+    Examples:
+        >>> round(float(haversine(39.7392, -104.9903, 40.0150, -105.2705)), 1)  # Denver to Boulder
+        38.9
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1)/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin((lon2 - lon1)/2)**2
+    return 2*EARTH_RADIUS_KM*np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def radius_bbox(lat, lon, km):
+    """Bounding box (lat_min, lat_max, lon_min, lon_max) of all points within `km` of (`lat`, `lon`)
+
+    The longitude range may wrap (lon_min > lon_max) across the antimeridian, and spans the
+    whole globe when the circle covers a pole.
+    """
+    dlat = np.degrees(km/EARTH_RADIUS_KM)
+    lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if lat_min <= -90 or lat_max >= 90 or km >= np.pi*EARTH_RADIUS_KM/2:
+        return lat_min, lat_max, -180.0, 180.0
+    dlon = np.degrees(np.arcsin(min(np.sin(km/EARTH_RADIUS_KM)/np.cos(np.radians(lat)), 1.0)))
+    if dlon >= 180:
+        return lat_min, lat_max, -180.0, 180.0
+    return lat_min, lat_max, _wrap_lon(lon - dlon), _wrap_lon(lon + dlon, upper=True)
+
+def _wrap_lon(lon, upper=False):
+    """Wrap a longitude into [-180, 180), or into (-180, 180] for the `upper` bound of a range"""
+    if upper:
+        return -_wrap_lon(-lon)
+    return (lon + 180.0) % 360.0 - 180.0
+
+###############################################################################
+#                                   Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class GeoIndex(object):
+    """Grid spatial index over points. Queries return positions into the arrays it was built from
+
+    Examples:
+        Queries agree with brute force over all points, including boxes across the antimeridian,
+        single meridians, radii around a pole and k-nearest:
+
+        >>> rng = np.random.RandomState(0)
+        >>> lat, lon = np.degrees(np.arcsin(rng.uniform(-1, 1, 20000))), rng.uniform(-180, 180, 20000)
+        >>> lon[:10], lon[10:20] = 180.0, -180.0
+        >>> index = GeoIndex(lat, lon)
+        >>> def brute_bbox(lat_min, lat_max, lon_min, lon_max):
+        ...     lon_max += 360 if lon_min > lon_max else 0
+        ...     in_lon = np.any([(lon + turn >= lon_min) & (lon + turn <= lon_max) for turn in (-360, 0, 360)], axis=0)
+        ...     return np.flatnonzero((lat >= lat_min) & (lat <= lat_max) & in_lon)
+        >>> all(np.array_equal(index.bbox(*box), brute_bbox(*box)) for box in
+        ...     [(30, 45, -110, -90), (-20, 20, 170, -170), (-90, 90, 180, 180), (-90, 90, 0.5, 0.5),
+        ...      (-90, 90, 170, 180), (-90, 90, 170, -180), (-90, 90, -180, -170), (-90, 90, -180, 180)])
+        True
+        >>> distances = haversine(89.5, 30, lat, lon)
+        >>> positions, km = index.radius(89.5, 30, 800)
+        >>> np.array_equal(np.sort(positions), np.flatnonzero(distances <= 800)), bool(np.all(np.diff(km) >= 0))
+        (True, True)
+        >>> positions, km = index.nearest(-33.9, 151.2, k=25)
+        >>> np.allclose(km, np.sort(haversine(-33.9, 151.2, lat, lon))[:25])
+        True
+    """
+    def __init__(self, lat, lon, cell_deg=0.5):
+        """Build the index. Points with missing (NaN) coordinates are left out
+
+        Args:
+            lat:        Array of latitudes in degrees
+            lon:        Array of longitudes in degrees
+
+        Kwargs:
+            cell_deg:   Grid cell size in degrees
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = _wrap_lon(np.asarray(lon, dtype=np.float64))
+        self.cell_deg = cell_deg
+        self._ncols = int(np.ceil(360.0/cell_deg))
+        self._nrows = int(np.ceil(180.0/cell_deg)) + 1
+
+        positions = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        cells = self._cell_ids(lat[positions], lon[positions])
+        order = np.argsort(cells, kind="stable")
+
+        ## Everything stored in cell order
+        self._cells = cells[order]
+        self._positions = positions[order]
+        self._lat = lat[self._positions]
+        self._lon = lon[self._positions]
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __repr__(self):
+        return f"Spatial grid index of {len(self)} points in {self.cell_deg} degree cells"
+
+    def _row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90.0)/self.cell_deg).astype(np.int64), 0, self._nrows - 1)
+
+    def _col(self, lon):
+        return np.clip(np.floor((np.asarray(lon) + 180.0)/self.cell_deg).astype(np.int64), 0, self._ncols - 1)
+
+    def _cell_ids(self, lat, lon):
+        return self._row(lat)*self._ncols + self._col(lon)
+
+    def _candidates(self, lat_min, lat_max, lon_min, lon_max):
+        """Internal (cell ordered) indices of points in all cells overlapping a non-wrapping box"""
+        rows = np.arange(self._row(lat_min), self._row(lat_max) + 1)
+        starts = np.searchsorted(self._cells, rows*self._ncols + self._col(lon_min), side="left")
+        stops = np.searchsorted(self._cells, rows*self._ncols + self._col(lon_max), side="right")
+        lengths = stops - starts
+        if not lengths.sum():
+            return np.empty(0, dtype=np.int64)
+        ## Concatenate the ranges [start, stop) without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum())
+
+    def _box(self, lat_min, lat_max, lon_min, lon_max):
+        """Internal indices of points inside a non-wrapping box, on stored longitudes"""
+        found = self._candidates(lat_min, lat_max, lon_min, lon_max)
+        lat, lon = self._lat[found], self._lon[found]
+        return found[(lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)]
+
+    def _bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Internal indices of points inside a box, which may wrap the antimeridian
+
+        Points on the antimeridian are stored at -180, so a box reaching 180 searches there too.
+        """
+        if lon_min > lon_max:
+            return np.concatenate([self._box(lat_min, lat_max, lon_min, 180.0),
+                                   self._box(lat_min, lat_max, -180.0, lon_max)])
+        found = self._box(lat_min, lat_max, lon_min, lon_max)
+        if lon_max >= 180 and lon_min > -180:
+            found = np.concatenate([found, self._box(lat_min, lat_max, -180.0, -180.0)])
+        return found
+
+    def bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Positions of points within a bounding box (edges inclusive). lon_min > lon_max wraps the antimeridian"""
+        if lon_max - lon_min >= 360:
+            lon_min, lon_max = -180.0, 180.0
+        elif lon_min == lon_max:
+            ## A single meridian. Wrap both bounds alike, else 180..180 would become -180..180
+            lon_min = lon_max = _wrap_lon(lon_min)
+        else:
+            lon_min, lon_max = _wrap_lon(lon_min), _wrap_lon(lon_max, upper=True)
+        found = self._bbox(lat_min, lat_max, lon_min, lon_max)
+        return np.sort(self._positions[found])
+
+    def radius(self, lat, lon, km):
+        """Positions of points within `km` of (`lat`, `lon`), and their distances in km, nearest first"""
+        found = self._bbox(*radius_bbox(lat, lon, km))
+        distances = haversine(lat, lon, self._lat[found], self._lon[found])
+        keep = distances <= km
+        found, distances = found[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return self._positions[found[order]], distances[order]
+
+    def nearest(self, lat, lon, k=10):
+        """Positions of the `k` points nearest to (`lat`, `lon`), and their distances in km, nearest first
+
+        Searches a radius of one grid cell first, doubling it until at least `k` points are
+        within it (the k nearest are then guaranteed to be among them).
+        """
+        km = self.cell_deg*111.0
+        k = min(k, len(self))
+        while True:
+            positions, distances = self.radius(lat, lon, km)
+            if len(positions) >= k or km >= np.pi*EARTH_RADIUS_KM:
+                return positions[:k], distances[:k]
+            km *= 2
@@ -12,7 +12,7 @@ __status__ = "Dev"
 __doc__ = """
 File name: ipfilter.py
 Created: Mar 30 2017
-Modified: Mar 31 2017
+Modified: Oct 19 2026
 
 Summary:
     Simple module to help you load, filter, and store collections of IP metadata. 
@@ -26,6 +26,12 @@ Details:
     off new filtered subsets. Under the hood, everything is stored as a pair of GEO/RDAP 
     metadata filled Pandas DataFrames. 
 
+    IPv4 and IPv6 addresses (and CIDR blocks) are indexed by their integer form: both DataFrames
+    get `ip_version`, `ip_prefixlen`, `ip_hi` and `ip_lo` columns, the latter two being the
+    128 bit address split into uint64 halves (IPv4 mapped into ::ffff:0:0/96, see `utils.ip_span`).
+    Rows are kept sorted by (`ip_version`, `ip_hi`, `ip_lo`), so range and prefix filters are binary
+    searches, and IPv4 addresses never mix with the IPv4-mapped IPv6 addresses they alias.
+
 Examples:
     ## Load up metadata
     ipmeta = IPMeta(filename="IPDB.json")
@@ -36,8 +42,9 @@ Examples:
     USA_ipmeta = ipmeta.filter_kv("country_name","United States") # Returns another IPMeta() instance
     USA_ipmeta.dump_json("USA_IPs.json")        # Save to file
 
-    ## Back to original dataset, (alphanumerically) filter by a range of IP addresses
+    ## Back to original dataset, filter by an (inclusive) range of IP addresses or a CIDR block
     subset = ipmeta.filter_ip_range("192.168.2.11", "195.177.5.11")
+    v6_subset = ipmeta.filter_prefix("2001:db8::/32")
     subset.content                              # Raw dict/JSON metadata
     subset.ips                                  # Array of IP addresses associated with this metadata set
 
@@ -48,9 +55,23 @@ Examples:
     ones = ipmeta.filter_mentions(1)      # Returns a subset where metadata has a '1' in it, anywhere. 
     my_network = ipmeta.filter_mentions('192.168.2')  # Maybe your network all starts with 192.168
 
+    ## Summary reports. Group by any GEO/RDAP key, or by IP prefix ("/24", or "/24/48" for IPv4 /24s and IPv6 /48s)
+    ipmeta.group_by("country_name")                     # IPs per country (pandas Series, largest first)
+    ipmeta.group_by("name", top=20)                     # Top 20 RDAP network names by IP count
+    ipmeta.group_by("/24")                              # IPs per /24
+    ipmeta.group_by("region_name", distinct="handle")   # Distinct RDAP networks per region
+
+    ## Spatial queries on GEO latitude/longitude, backed by a grid index built once per dataset
+    denver = ipmeta.filter_radius(39.7392, -104.9903, km=50)    # IPs within 50 km of Denver
+    colorado = ipmeta.filter_bbox(37, 41, -109.05, -102.05)     # IPs in a lat/lon bounding box
+    ipmeta.nearest(39.7392, -104.9903, k=10)                    # Distances (km) of the 10 nearest IPs
+
     ###### You can also call this module to filter key-value pairs of a JSON file, and save the results to 
     # a new file. 
     python ipfilter.py IPDB.json "country_code" "United States" --output="subset.json"
+    ## Or print a report, of the whole file or of a filtered subset
+    python ipfilter.py IPDB.json --group-by country_name --top 20
+    python ipfilter.py IPDB.json "country_code" "US" --group-by region_name --distinct handle
 
 TODO/Improvements:
     * Rework the IPMeta so that it would be able to work with just one metadata type (RDAP/GEO) 
@@ -67,13 +88,19 @@ TODO/Improvements:
 import os
 import sys
 import utils
-import pandas as pd
+import geoindex
 import json
 import argparse
 
 ###### Module Wide Objects
 _here = os.path.dirname(os.path.realpath(__file__))
 logger = utils.logger
+pd = utils.lazy_import("pandas")
+np = utils.lazy_import("numpy")
+
+## Integer IP index columns added to each metadata DataFrame. See `index_ips()`
+_IP_COLUMNS = ["ip_version", "ip_prefixlen", "ip_hi", "ip_lo"]
+_IP_SORT = ["ip_version", "ip_hi", "ip_lo", "ip_prefixlen"]
 
 
 ##############################################################################
@@ -96,15 +123,87 @@ def process_datastore(data):
     df_geo = pd.DataFrame([value for value in geo_data.values()])
     df_rdap = pd.DataFrame([value for value in rdap_data.values()])
 
-    ## Sort dataframes by IP because that is nice to have
-    df_geo.sort_values(by="ip", inplace=True)
-    df_rdap.sort_values(by="ip", inplace=True)
+    return index_ips(df_geo), index_ips(df_rdap)
 
-    ## Also, make the IP address the index since we will want to cross reference the two datasets
-    df_geo.index = df_geo["ip"]
-    df_rdap.index = df_rdap["ip"]
+def index_ips(df):
+    """Add integer IP columns to a metadata DataFrame and sort it by address
+
+    Adds the `_IP_COLUMNS` (version, prefix length and uint64 high/low address halves) computed
+    from the `ip` column, sorts numerically by address and makes `ip` the index since we will
+    want to cross reference the GEO and RDAP datasets.
+    """
+    if "ip" not in df:
+        return df
+    keys = [utils.ip_key(ip) for ip in df["ip"]]
+    for ii, column in enumerate(_IP_COLUMNS):
+        dtype = np.uint64 if column in ("ip_hi", "ip_lo") else np.uint8
+        df[column] = np.array([key[ii] for key in keys], dtype=dtype)
+    df = df.sort_values(by=_IP_SORT)
+    df.index = df["ip"]
+    return df
+
+def _ip_bounds(ip):
+    """(version, first), (version, last) sort keys of the addresses covered by an address or CIDR block"""
+    version = utils.ip_key(ip)[0]
+    first, last = utils.ip_span(ip)
+    return (version, first), (version, last)
+
+def _searchsorted(df, bound, side="left"):
+    """Row position where (version, 128 bit integer) `bound` would go in a DataFrame sorted by (ip_version, ip_hi, ip_lo)
+
+    Binary search on the versions, then on the high halves within that version, then on the
+    low halves among rows sharing `bound`'s high half
+    """
+    version, value = bound
+    hi, lo = (np.uint64(half) for half in utils.split_ip_int(value))
+    versions = df["ip_version"].to_numpy()
+    start, stop = np.searchsorted(versions, version, side="left"), np.searchsorted(versions, version, side="right")
+    his = df["ip_hi"].to_numpy()[start:stop]
+    start, stop = start + np.searchsorted(his, hi, side="left"), start + np.searchsorted(his, hi, side="right")
+    return start + np.searchsorted(df["ip_lo"].to_numpy()[start:stop], lo, side=side)
+
+def _ip_slice(df, first, last):
+    """Rows of an indexed DataFrame whose address lies within (version, integer) bounds [first, last]"""
+    if "ip_hi" not in df:
+        return df
+    return df.iloc[_searchsorted(df, first, side="left"):_searchsorted(df, last, side="right")]
+
+def _parse_prefix(key):
+    """Prefix lengths (ipv4, ipv6) from a prefix group key like "/24" or "/24/48". None if `key` isn't one"""
+    if not isinstance(key, str) or not key.startswith("/"):
+        return None
+    lengths = key[1:].split("/")
+    if len(lengths) > 2 or not all(length.isdigit() for length in lengths):
+        raise ValueError(f"Bad prefix group '{key}', expected '/N' or '/N/M' with integer prefix lengths")
+    prefixlen4, prefixlen6 = int(lengths[0]), int(lengths[-1])
+    if len(lengths) == 1 and prefixlen4 > 32:
+        raise ValueError(f"Bad prefix group '{key}', a single prefix length applies to IPv4 too so must be 0-32. Use '/N/M' for a longer IPv6 one")
+    if prefixlen4 > 32 or prefixlen6 > 128:
+        raise ValueError(f"Bad prefix group '{key}', prefix lengths must be 0-32 for IPv4 and 0-128 for IPv6")
+    return prefixlen4, prefixlen6
+
+def _prefix_masks(prefixlen):
+    """uint64 (high, low) halves of the 128 bit netmask for `prefixlen`"""
+    mask = ((1 << prefixlen) - 1) << (128 - prefixlen)
+    return np.uint64(mask >> 64), np.uint64(mask & 0xFFFFFFFFFFFFFFFF)
+
+def prefix_groups(df, prefixlen4, prefixlen6):
+    """Integer prefix columns (ip_hi, ip_lo, ip_prefixlen) for each row of an indexed DataFrame
+
+    Each row's address is masked down to its /`prefixlen4` (IPv4) or /`prefixlen6` (IPv6) network.
+    CIDR block rows are placed by their network address.
+    """
+    is_v4 = df["ip_version"].to_numpy() == 4
+    hi_mask4, lo_mask4 = _prefix_masks(96 + prefixlen4)
+    hi_mask6, lo_mask6 = _prefix_masks(prefixlen6)
+    return pd.DataFrame({"ip_hi": df["ip_hi"].to_numpy() & np.where(is_v4, hi_mask4, hi_mask6),
+                         "ip_lo": df["ip_lo"].to_numpy() & np.where(is_v4, lo_mask4, lo_mask6),
+                         "ip_prefixlen": np.where(is_v4, prefixlen4, prefixlen6).astype(np.uint8)},
+                        index=df.index)
 
-    return df_geo, df_rdap
+def _prefix_label(hi, lo, prefixlen):
+    """CIDR string for a group of `prefix_groups()` columns"""
+    return utils.ip_from_id((((int(hi) << 64) | int(lo)) << 8) | int(prefixlen))
 
 
 ##############################################################################
@@ -124,6 +223,15 @@ class IPMeta(object):
     def ips(self):
         return self.df_geo['ip'].values
 
+    @property
+    def geo_index(self):
+        """`geoindex.GeoIndex` over GEO latitude/longitude, positions matching rows of `df_geo`"""
+        if self._geo_index is None:
+            coords = [pd.to_numeric(self.df_geo.get(key, pd.Series(dtype=float)), errors="coerce").to_numpy(dtype=float)
+                      for key in ("latitude", "longitude")]
+            self._geo_index = geoindex.GeoIndex(*coords)
+        return self._geo_index
+
     def __init__(self, data=None, filename=None, df_geo=None, df_rdap=None, nanrep=""):
         """Class to help search/filter out GEO and RDAP IP address information
         
@@ -147,12 +255,22 @@ class IPMeta(object):
         elif filename:
             df_geo, df_rdap = process_datastore(load_datastore(filename))
         
-        ## Internally stored DataFrames of ip address metadata
+        ## Internally stored DataFrames of ip address metadata, indexed by integer IP if they aren't yet
         self.df_geo = df_geo.fillna(nanrep)
         self.df_rdap = df_rdap.fillna(nanrep)
+        if not set(_IP_COLUMNS).issubset(self.df_geo.keys()):
+            self.df_geo = index_ips(self.df_geo)
+        if not set(_IP_COLUMNS).issubset(self.df_rdap.keys()):
+            self.df_rdap = index_ips(self.df_rdap)
 
         ## Handy attribute, store searchable keys
-        self.searchable = sorted(pd.np.unique(list(self.df_rdap.keys()) + list(self.df_geo.keys())))
+        self.searchable = sorted(np.unique(list(self.df_rdap.keys()) + list(self.df_geo.keys())))
+
+        ## Categorical versions of columns that have been grouped on, built on demand. See `_column()`
+        self._categoricals = {}
+
+        ## Spatial index over GEO latitude/longitude, built on first spatial query. See `geo_index`
+        self._geo_index = None
     
     def __repr__(self):
         return f"Filterable IP dataset with {len(self.df_geo)} addresses in it"
@@ -163,22 +281,39 @@ class IPMeta(object):
         Returns:
             _:  (list) - List of IP addresses that match that condition 
         """
-        return self.df_geo.query(f"""{key}=={value}""")['ip'].values
+        return self.df_geo[self.df_geo[key] == value]['ip'].values
     
     def _filter_rdap(self,key,value):
         """See _filter_geo()"""
-        return self.df_rdap.query(f"""{key}=={value}""")['ip'].values
+        return self.df_rdap[self.df_rdap[key] == value]['ip'].values
     
     def ip_subset(self, ips):
         """Take a subset of GEO/RDAP metadata information just for ip addresses `ips`
 
-        As long as at least one address in `ips` exists in the dataframes, subsets will be returned.
+        Addresses are matched on canonical form (so '2001:DB8::1' finds '2001:db8::1'). Addresses
+        with no metadata are ignored.
         """
         ## Allow for a single IP address
         if isinstance(ips, str):
             ips = [ips]
-        return self.df_geo.loc[ips], self.df_rdap.loc[ips]
+        ips = {utils.canonical_ip(ip) for ip in ips}
+        return self.df_geo[self.df_geo.index.isin(ips)], self.df_rdap[self.df_rdap.index.isin(ips)]
     
+    def merge(self, other):
+        """New IPMeta with the metadata of both this and IPMeta `other`, `other` winning for IPs in both
+
+        Handy for adding a few new IPs to a big dataset without rebuilding it from scratch.
+        """
+        frames = []
+        for mine, theirs in ((self.df_geo, other.df_geo), (self.df_rdap, other.df_rdap)):
+            parts = [df for df in (mine, theirs) if len(df.columns)]
+            df = pd.concat(parts) if parts else pd.DataFrame()
+            df = df[~df.index.duplicated(keep="last")]
+            if set(_IP_SORT).issubset(df.keys()):
+                df = df.sort_values(by=_IP_SORT)
+            frames.append(df)
+        return IPMeta(df_geo=frames[0], df_rdap=frames[1])
+
     def filter_ip_list(self, ips):
         """Filter IP datastore by a list of IP addresses
 
@@ -190,18 +325,45 @@ class IPMeta(object):
         return IPMeta(df_geo=df_geo, df_rdap=df_rdap)
     
     def filter_ip_range(self, ipmin, ipmax):
-        """Filter by IP min and maximum
+        """Filter by IP min and maximum (inclusive)
 
-        **NOTE** IP Range filtering is alphanumeric. So 254.254.254.254 < 5.1.1.1!!
+        Comparison is numeric on the integer form of addresses, all IPv4 sorting before all IPv6,
+        so a range from an IPv4 to an IPv6 address spans both families. A CIDR block argument
+        stands for its first/last address. A CIDR block in the metadata is placed by its network address.
 
         Example:
-            ipmeta.filter_ip_list('192.168.2.151','192.168.2.155')
+            ipmeta.filter_ip_range('192.168.2.151','192.168.2.155')
             # Will return an IPMeta instance with GEO/RDAP metadata for IP addresses '192.168.2.151' through '192.168.2.155'
             # (where metadata exists in the first place, of course)
+
+            An IPv4 address and its IPv4-mapped IPv6 form are different addresses:
+
+            >>> ips = ["1.2.3.4", "::ffff:102:304", "10.0.0.0/8", "10.1.2.3", "11.0.0.1"]
+            >>> ipmeta = IPMeta(data={ip: {"GEO": {"ip": ip}, "RDAP": {"ip": ip}} for ip in ips})
+            >>> list(ipmeta.filter_ip_range('1.2.3.4', '1.2.3.4').ips)
+            ['1.2.3.4']
+            >>> list(ipmeta.filter_ip_range('::ffff:0:0', '::ffff:ffff:ffff').ips)
+            ['::ffff:102:304']
         """
-        df_geo = self.df_geo.query(f"ip > '{ipmin}' and ip < '{ipmax}'")
-        df_rdap = self.df_rdap.query(f"ip > '{ipmin}' and ip < '{ipmax}'")
-        return IPMeta(df_geo=df_geo, df_rdap=df_rdap)
+        first, last = _ip_bounds(ipmin)[0], _ip_bounds(ipmax)[1]
+        return IPMeta(df_geo=_ip_slice(self.df_geo, first, last), df_rdap=_ip_slice(self.df_rdap, first, last))
+
+    def filter_prefix(self, cidr):
+        """Filter down to addresses (and smaller CIDR blocks) within the CIDR block `cidr`
+
+        Example:
+            ipmeta.filter_prefix('192.168.2.0/24')
+            ipmeta.filter_prefix('2001:db8::/32')
+
+            >>> ips = ["1.2.3.4", "::ffff:102:304", "10.0.0.0/8", "10.1.2.3", "11.0.0.1"]
+            >>> ipmeta = IPMeta(data={ip: {"GEO": {"ip": ip}, "RDAP": {"ip": ip}} for ip in ips})
+            >>> list(ipmeta.filter_prefix('10.0.0.0/8').ips)
+            ['10.0.0.0/8', '10.1.2.3']
+            >>> list(ipmeta.filter_prefix('::ffff:0:0/96').ips)
+            ['::ffff:102:304']
+        """
+        first, last = _ip_bounds(cidr)
+        return IPMeta(df_geo=_ip_slice(self.df_geo, first, last), df_rdap=_ip_slice(self.df_rdap, first, last))
 
     def filter_kv(self,key,value):
         """Filter IP metadata by key-value pairs
@@ -210,7 +372,8 @@ class IPMeta(object):
         first for a match, then through RDAP information. In either case, whererver the filtering
         conditions are met, the GEO and RDAP information is returned for that subset of IP address.
 
-        Explicitly, filtering is NOT done in place. 
+        Explicitly, filtering is NOT done in place. `value` is compared as is, never evaluated,
+        so it is safe to pass straight from untrusted input.
 
         Returns:
             _:      (IPMeta()) - A new IPMeta() object containing just the filtered data subset
@@ -221,10 +384,6 @@ class IPMeta(object):
             logger.debug(f"Attributes you can search through: {self.searchable}")
             return IPMeta(df_rdap=pd.DataFrame(), df_geo=pd.DataFrame())
         
-        ## Condition arguments
-        if isinstance(value, str):
-            value = f"'{value}'"
-
         ## Try to filter GEO dataset
         if key in self.df_geo.keys():
             matching_ips = self._filter_geo(key,value)
@@ -244,62 +403,212 @@ class IPMeta(object):
             oddity = ipmeta.filter_mentions('1 Tran Huu Duc')  # Some address component in Vietnam
             # '116.101.14.224' ip address has this address mentioned in one of the `remarks` within RDAP metadata 
         """
-        geo_matches = self.df_geo[ self.df_geo.apply(lambda row: True in [str(mention) in str(value) for value in row.iteritems()], axis=1) ]['ip']
-        rdap_matches = self.df_rdap[ self.df_rdap.apply(lambda row: True in [str(mention) in str(value) for value in row.iteritems()], axis=1) ]['ip']
+        geo_matches = self.df_geo[ self.df_geo.apply(lambda row: True in [str(mention) in str(value) for value in row.items()], axis=1) ]['ip']
+        rdap_matches = self.df_rdap[ self.df_rdap.apply(lambda row: True in [str(mention) in str(value) for value in row.items()], axis=1) ]['ip']
 
-        ips = pd.np.unique(list(geo_matches) + list(rdap_matches))
+        ips = np.unique(list(geo_matches) + list(rdap_matches))
 
         return self.filter_ip_list(ips)
         # return geo_matches, rdap_matches
 
+    def _geo_rows(self, positions):
+        """IPMeta subset of the `df_geo` rows at `positions`, and the matching RDAP rows"""
+        df_geo = self.df_geo.iloc[np.sort(positions)]
+        return IPMeta(df_geo=df_geo, df_rdap=self.df_rdap[self.df_rdap.index.isin(df_geo.index)])
+
+    def filter_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Filter down to IPs whose GEO latitude/longitude lies within a bounding box (edges inclusive)
+
+        A box with lon_min > lon_max crosses the antimeridian.
+
+        Example:
+            ipmeta.filter_bbox(37, 41, -109.05, -102.05)    # Roughly Colorado
+        """
+        return self._geo_rows(self.geo_index.bbox(lat_min, lat_max, lon_min, lon_max))
+
+    def filter_radius(self, lat, lon, km):
+        """Filter down to IPs whose GEO latitude/longitude is within `km` (great circle distance) of (`lat`, `lon`)
+
+        Example:
+            ipmeta.filter_radius(39.7392, -104.9903, km=50)   # Within 50 km of Denver
+        """
+        positions, _ = self.geo_index.radius(lat, lon, km)
+        return self._geo_rows(positions)
+
+    def nearest(self, lat, lon, k=10):
+        """The `k` IPs whose GEO latitude/longitude is nearest to (`lat`, `lon`)
+
+        Returns:
+            _:      (pd.Series) - Distances in km indexed by IP address, nearest first. Use 
+                    `filter_ip_list()` on its index for the associated metadata
+        """
+        positions, distances = self.geo_index.nearest(lat, lon, k=k)
+        return pd.Series(distances, index=self.df_geo.index[positions], name="distance_km")
+
+    def _column(self, key):
+        """Categorical Series (indexed by ip) of GEO/RDAP metadata `key`, GEO taking precedence
+
+        Converted once per dataset and cached, so repeated reports group on integer category codes
+        """
+        if key not in self._categoricals:
+            df = self.df_geo if key in self.df_geo.keys() else self.df_rdap
+            column = df[key]
+            if column.dtype == object:
+                try:
+                    column = column.astype("category")
+                except TypeError:
+                    ## Unhashable values (RDAP lists and dicts) are grouped by their string form
+                    column = column.astype(str).astype("category")
+            self._categoricals[key] = column
+        return self._categoricals[key]
+
+    def group_by(self, key, distinct=None, top=None):
+        """Count IP addresses per value of `key`, largest groups first
+
+        Kwargs:
+            distinct:   Count distinct values of this GEO/RDAP key per group, instead of IPs
+            top:        Only return the `top` largest groups
+
+        Args:
+            key:    A GEO or RDAP metadata key, or an IP prefix: "/24" groups all addresses by 
+                    their /24 network, "/24/48" groups IPv4 by /24 and IPv6 by /48. Prefix
+                    lengths must be 0-32 for IPv4 and 0-128 for IPv6 (`ValueError` otherwise)
+
+        Returns:
+            _:      (pd.Series) - Counts indexed by group value (CIDR strings for prefix groups)
+
+        Example:
+            ipmeta.group_by("country_name", top=20)
+            ipmeta.group_by("region_name", distinct="handle")
+
+            >>> rows = [("1.2.3.4", "Germany", "NET-A"), ("1.2.3.9", "Germany", "NET-A"), ("10.1.2.3", "Japan", "NET-B"),
+            ...         ("10.1.9.9", "Japan", "NET-C"),
+            ...         ("2001:db8::1", "Japan", "NET-D"), ("2001:db8::2", "Japan", "NET-D"), ("2001:db8:0:1::1", "Japan", "NET-D")]
+            >>> ipmeta = IPMeta(data={ip: {"GEO": {"ip": ip, "country_name": country}, "RDAP": {"ip": ip, "handle": handle}}
+            ...                       for ip, country, handle in rows})
+            >>> ipmeta.group_by("country_name").to_dict()
+            {'Japan': 5, 'Germany': 2}
+            >>> ipmeta.group_by("country_name", distinct="handle").to_dict()
+            {'Japan': 3, 'Germany': 1}
+            >>> ipmeta.group_by("handle", top=1).to_dict()
+            {'NET-D': 3}
+            >>> ipmeta.group_by("/24/48").to_dict()
+            {'2001:db8::/48': 3, '1.2.3.0/24': 2, '10.1.2.0/24': 1, '10.1.9.0/24': 1}
+            >>> ipmeta.group_by("/33")
+            Traceback (most recent call last):
+            ...
+            ValueError: Bad prefix group '/33', a single prefix length applies to IPv4 too so must be 0-32. Use '/N/M' for a longer IPv6 one
+            >>> ipmeta.group_by("/abc")
+            Traceback (most recent call last):
+            ...
+            ValueError: Bad prefix group '/abc', expected '/N' or '/N/M' with integer prefix lengths
+        """
+        name = "ips" if distinct is None else f"distinct_{distinct}"
+        prefix = _parse_prefix(key)
+        fields = [distinct] if prefix is not None else [key, distinct]
+        missing = [field for field in fields if field is not None and field not in self.searchable]
+        if missing:
+            logger.warn(f"IP GEO or RDAP metadata store has no attribute(s) {missing}. Empty report returned")
+            logger.debug(f"Attributes you can group by: {self.searchable}")
+            return pd.Series(dtype=np.int64, name=name)
+
+        if prefix is not None:
+            df = self.df_geo if "ip_hi" in self.df_geo.keys() else self.df_rdap
+            if "ip_hi" not in df.keys():
+                return pd.Series(dtype=np.int64, name=name)
+            keys = prefix_groups(df, *prefix)
+        else:
+            keys = self._column(key).to_frame(key)
+
+        if distinct is None:
+            counts = keys.groupby(list(keys.keys()), observed=True, sort=False).size()
+        else:
+            frame = keys.join(self._column(distinct).rename("_distinct"), how="inner")
+            counts = frame.groupby(list(keys.keys()), observed=True, sort=False)["_distinct"].nunique()
+
+        if top is not None:
+            counts = counts.nlargest(top)
+        else:
+            counts = counts.sort_values(ascending=False, kind="stable")
+
+        ## Label prefix groups last, so only the groups reported get converted to strings
+        if prefix is not None:
+            counts.index = pd.Index([_prefix_label(*group) for group in counts.index])
+        counts.index.name = key
+        counts.name = name
+        return counts
+
     def to_dict(self):
         """Convert (potentially) filtererd IP metadata back into a dictionary that matches JSON data stores
         """
-        return {ip:{"RDAP":self.df_rdap.loc[ip].to_dict(), "GEO":self.df_geo.loc[ip].to_dict()} for ip in self.df_geo['ip']}
+        df_geo = self.df_geo.drop(columns=_IP_COLUMNS, errors="ignore")
+        df_rdap = self.df_rdap.drop(columns=_IP_COLUMNS, errors="ignore")
+        return {ip:{"RDAP":df_rdap.loc[ip].to_dict(), "GEO":df_geo.loc[ip].to_dict()} for ip in df_geo['ip']}
     
     def dump_json(self, fname):
         """Dump dict/JSON to a file
         """
         with open(fname,'w') as fp:
             json.dump(self.content, fp, indent=2, cls=utils.MyEncoder)
-        logger.info(f"Stored filtered IP address metadata to {output}")
+        logger.info(f"Stored filtered IP address metadata to {fname}")
 
 ##############################################################################
 #                             Runtime Execution
 #----------*----------*----------*----------*----------*----------*----------*
-def main(filename, filter_key, filter_value, output=None, printout=False):
-    logger.info(f"Loading {filename} for filtering where metadata's '{filter_key}' == {filter_value}")
+def main(filename, filter_key=None, filter_value=None, output=None, printout=False, group_by=None, distinct=None, top=None):
+    logger.info(f"Loading {filename}")
     data = load_datastore(filename)
     
     ipMeta = IPMeta(data=data)
 
-    filtered = ipMeta.filter_kv(filter_key, filter_value)
+    if filter_key is None:
+        filtered = ipMeta
+    else:
+        logger.info(f"Filtering where metadata's '{filter_key}' == {filter_value}")
+        filtered = ipMeta.filter_kv(filter_key, filter_value)
+        logger.info(f"After filtering, metadata went from {len(data)} to {len(filtered.df_geo)} items")
 
-    logger.info(f"After filtering, metadata went from {len(data)} to {len(filtered.content)} items")
+    ###### Print summary report
+    if group_by is not None:
+        report = filtered.group_by(group_by, distinct=distinct, top=top)
+        print(report.to_string())
 
     ###### Store results to file
+    if filter_key is None and output is None:
+        return 0
     if output is None:
         output = filename + ".filtered"
     
     filtered.dump_json(output)
     if printout:
-        print(json.dumps(filtered.content, indent=2))
-    return filtered
+        print(json.dumps(filtered.content, indent=2, cls=utils.MyEncoder))
+    return 0
 
 
 if __name__ == '__main__':
-    parser   = argparse.ArgumentParser(description='Filter a file of stored IP GEO/RDAP JSON metadata', 
-                    epilog='Example of use: python ipfilter.py IPdata.json "country code" "United States" --output="subset.json"')
+    parser   = argparse.ArgumentParser(description='Filter a file of stored IP GEO/RDAP JSON metadata, and/or print summary reports of it', 
+                    epilog='Example of use: python ipfilter.py IPdata.json "country code" "United States" --output="subset.json" --group-by region_name')
     parser.add_argument('input', help="Filename of stored JSON metadata")
-    parser.add_argument('filter_key', help="Filtering Key that you are looking for")
-    parser.add_argument('filter_value', help="Value that you want filter_key to take on in either RDAP or GEO IP metadata")
+    parser.add_argument('filter_key', nargs='?', default=None, help="Filtering Key that you are looking for")
+    parser.add_argument('filter_value', nargs='?', default=None, help="Value that you want filter_key to take on in either RDAP or GEO IP metadata")
     parser.add_argument('--output', nargs='?', default=None, help="Output filename to store filtered IP address metadata to")
     parser.add_argument('--printout', nargs='?', default=False, help="Print output to screen")
+    parser.add_argument('--group-by', nargs='?', default=None, help="Print IP counts per value of this GEO/RDAP key, or per IP prefix ('/24', '/24/48')")
+    parser.add_argument('--distinct', nargs='?', default=None, help="With --group-by, count distinct values of this key per group instead of IPs")
+    parser.add_argument('--top', nargs='?', type=int, default=None, help="With --group-by, only report this many of the largest groups")
     args = parser.parse_args()
+    utils.setup_logging()
+    if args.filter_key is None and args.group_by is None:
+        parser.error("Nothing to do, provide filter_key/filter_value and/or --group-by")
+    if (args.filter_key is None) != (args.filter_value is None):
+        parser.error("Provide both filter_key and filter_value, or neither")
+    if args.group_by is None and (args.distinct is not None or args.top is not None):
+        parser.error("--distinct and --top only apply to a --group-by report")
     filename = args.input
     output = args.output
     printout = args.printout
     filter_key = args.filter_key
     filter_value = args.filter_value
-    status = main(filename, filter_key, filter_value, output=output, printout=printout)
-    sys.exit(status)
\ No newline at end of file
+    status = main(filename, filter_key, filter_value, output=output, printout=printout,
+                  group_by=args.group_by, distinct=args.distinct, top=args.top)
+    sys.exit(status)
@@ -12,11 +12,17 @@ __status__ = "Dev"
 __doc__ = """
 File name: ipinfo.py
 Created: Mar 30 2017
-Modified: Mar 31 2017
+Modified: Oct 19 2026
 
 Summary:
     Pretty basic, provides some abstract functions for obtaining metadata for IP 
     addresses from various web services
+
+Details:
+    IPv4 and IPv6 addresses and CIDR blocks of either are supported. Addresses are put in
+    canonical form (see `utils.canonical_ip`) before querying, so differently written forms
+    of one address share a cache entry and database key. RDAP is queried for a CIDR block
+    as a whole, GEO (which only knows single addresses) for the block's network address.
 """
 
 ##############################################################################
@@ -24,7 +30,6 @@ Summary:
 # ----------*----------*----------*----------*----------*----------*----------*
 import os
 import sys
-import requests
 from functools import lru_cache
 import utils
 import argparse
@@ -33,11 +38,13 @@ import json
 ###### Module Wide Objects
 _here = os.path.dirname(os.path.realpath(__file__))
 logger = utils.logger
+requests = utils.lazy_import("requests")
 
 _APIs = {"RDAP": "https://rdap.arin.net/bootstrap/ip/{ip}",
          "GEO": "http://freegeoip.net/json/{ip}"}
+_TIMEOUT = 10  # Seconds to wait on a web service before giving up (errors are raised, so not cached)
 
-db = utils.IPDB()
+_db = None # IPDB() interface, created on first use. See `get_db()`
 
 ##############################################################################
 #                                   Functions
@@ -57,7 +64,7 @@ def query_url(ip:str, kind:str) -> dict:
     url = _APIs[kind].format(ip=ip)
     logger.debug(f"Querying {kind} REST service with URL {url}")
 
-    resp = requests.get(url)
+    resp = requests.get(url, timeout=_TIMEOUT)
     if resp.status_code == 200:
         return resp.json()
     logger.warning(f"Error getting {kind} info for ip address: '{ip}'. Reason: '{resp.reason}'")
@@ -65,21 +72,33 @@ def query_url(ip:str, kind:str) -> dict:
 def fetch_RDAP(ip:str) ->dict:
     """Simple wrapper to fetch RDAP information
     """
-    return query_url(ip, "RDAP")
+    return query_url(utils.canonical_ip(ip), "RDAP")
 
 def fetch_GEO(ip:str) -> dict:
      """Simple wrapper to fetch GEO information
      """
-     return query_url(ip, "GEO")
+     return query_url(utils.canonical_ip(ip).partition("/")[0], "GEO")
+
+def get_db():
+    """Get the module's `IPDB` interface, loading the database from disk on first call
+
+    Kept lazy so that importing this module (or looking up IPs without storing them)
+    never pays for reading `IPDB.json`
+    """
+    global _db
+    if _db is None:
+        _db = utils.IPDB()
+    return _db
 
 def store_info(ip, rdap, geo):
     """Store fetched RDAP and GEO metadata to the `db` interface
     """
-    db.update(ip, rdap=rdap, geo=geo)
+    get_db().update(ip, rdap=rdap, geo=geo)
 
 def ip_lookup(ip, store=False):
     """Higher level function to lookup and store IP metadata from all defined services
     """
+    ip = utils.canonical_ip(ip)
     rdap = fetch_RDAP(ip)
     geo = fetch_GEO(ip)
     if store:
@@ -101,6 +120,7 @@ def main(ips=None):
     return 0
 
 if __name__ == '__main__':
+    utils.setup_logging()
     logger.debug("Running main ipinfo.py application")
     parser = argparse.ArgumentParser(description='Fetch metadata for some ip addresses',
         epilog='Example of use: python ipinfo.py 192.168.2.11 192.168.2.12')
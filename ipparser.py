@@ -15,7 +15,12 @@ Created: Mar 29 2017
 Modified: Mar 30 2017
 
 Summary:
-    Simple module to parse IPV4 IP addresses from a file. 
+    Simple module to parse IPV4 and IPV6 IP addresses, and CIDR blocks of either, from a file. 
+
+Details:
+    A single regex finds IPv4/IPv6 candidates (with an optional /prefix). IPv6 candidates are
+    deliberately loose (anything hex-and-colon shaped), so every match is then validated and
+    normalized to its canonical form with `utils.canonical_ip()`. 
 
 Examples:
     ## Module Callable
@@ -37,15 +42,38 @@ _here = os.path.dirname(os.path.realpath(__file__))
 logger = utils.logger
 
 # Regex pattern for IP address constraining each section to 0-255
-_IP_PATTERN = "\\b(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\.(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\.(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\.(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\b"
+_IPV4_PATTERN = "\\b(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\.(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\.(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\.(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\\b"
+# Loose IPv6 candidate: 2-7 hex groups and colons (covers `::` compression), ending in a hex group
+# or an embedded IPv4 address. Must not touch other word characters, so `std::map` is skipped
+_IPV6_PATTERN = "(?<![0-9A-Za-z:.])(?:[0-9A-Fa-f]{0,4}:){2,7}(?:(?:[0-9]{1,3}\\.){3}[0-9]{1,3}|[0-9A-Fa-f]{0,4})(?![0-9A-Za-z:])"
+# Either address, with an optional CIDR prefix length
+_IP_PATTERN = f"(?:{_IPV6_PATTERN}|{_IPV4_PATTERN})(?:/(?:12[0-8]|1[01][0-9]|[1-9]?[0-9])(?![0-9]))?"
 _IP_FILE = os.path.join(_here, "list_of_ips.txt")
 
 ##############################################################################
 #                                   Functions
 # ----------*----------*----------*----------*----------*----------*----------*
-def ipsearch(searchstring, pattern=_IP_PATTERN):
+def normalize_match(match):
+    """Canonical form of a matched IP address/CIDR block, or None if it isn't a valid one
+
+    A CIDR suffix that is out of range for the address version (`1.2.3.4/64`) is dropped
+    rather than throwing away the address itself.
+    """
+    try:
+        return utils.canonical_ip(match)
+    except ValueError:
+        pass
+    if "/" in match:
+        return normalize_match(match.partition("/")[0])
+    return None
+
+def ipsearch(searchstring, pattern=_IP_PATTERN, normalize=True):
     """Search a string for an IP address
 
+    Kwargs:
+        pattern:    Regex pattern that identifies IP addresses
+        normalize:  Validate matches and return them in canonical form (see `utils.canonical_ip`)
+
     Examples:
         >>> ipsearch("foo")
         []
@@ -53,8 +81,14 @@ def ipsearch(searchstring, pattern=_IP_PATTERN):
         ['33.33.53.155', '233.151.2.99']
         >>> ipsearch("Okay: 33.33.53.155 . Bad 211.999.191.99")
         ['33.33.53.155']
+        >>> ipsearch("Host 2001:0DB8::0001 via fe80::1%eth0, not std::map or 12:30:45")
+        ['2001:db8::1', 'fe80::1']
+        >>> ipsearch("allow 10.0.0.0/8, ::ffff:192.0.2.1 and 2001:db8::/32.")
+        ['10.0.0.0/8', '::ffff:c000:201', '2001:db8::/32']
     """
     matches = [match.group() for match in re.finditer(pattern, searchstring)]
+    if normalize:
+        matches = [ip for ip in map(normalize_match, matches) if ip is not None]
     if matches:
         logger.debug(f"Found {len(matches)} IP addresses in string '{searchstring}'")
     return matches
@@ -105,6 +139,7 @@ if __name__ == '__main__':
     args = parser.parse_args()
     filename = args.filename
     limit = int(args.limit)
+    utils.setup_logging()
     logger.debug("Running main ipparser.py application")
     status = main(filename=filename, limit=limit)
     sys.exit(status)
\ No newline at end of file
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+__author__ = 'Zach Dischner'
+__copyright__ = ""
+__credits__ = ["NA"]
+__license__ = "NA"
+__version__ = "0.0.0"
+__maintainer__ = "Zach Dischner"
+__email__ = "zach.dischner@gmail.com"
+__status__ = "Dev"
+__doc__ = """
+File name: ipservice.py
+Created: Oct 19 2026
+Modified: Oct 19 2026
+
+Summary:
+    Long-running lookup service. Keeps the IP database, lookup caches and a filterable
+    `IPMeta` dataset warm in memory, and answers lookup/filter requests over a local
+    HTTP/JSON API (TCP or Unix socket).
+
+Details:
+    Built on `asyncio` streams with a minimal HTTP/1.1 (keep-alive) implementation, so concurrent
+    clients are handled without a thread each and there are no extra dependencies.
+
+    * IPs already in `IPDB` are answered straight from memory
+    * Unknown IPs are fetched (`ipinfo.ip_lookup`) on a thread pool and stored in `IPDB`.
+      Concurrent requests for the same IP share one in-flight fetch
+    * Filter queries run against an `IPMeta` of the database, built once off the event loop.
+      Newly fetched IPs are merged into it when the next query comes in, rather than rebuilding
+      it. Its group-by categoricals and spatial index stay warm until then
+    * The database is committed to disk on POST /commit, written from a snapshot on a worker
+      thread so lookups carry on meanwhile, and on shutdown (SIGINT/SIGTERM)
+
+    Endpoints (all responses are JSON):
+        GET  /lookup?ip=IP              {ip: {"RDAP":rdap, "GEO":geo}}
+        POST /lookup                    {"ips": [IP, ...]} -> {ip: {"RDAP":rdap, "GEO":geo}, ...}
+        POST /filter                    {"filters": [[method, *args], ...],     Chained IPMeta filters, where method
+                                         "group_by": key, "distinct": key,      is one of `_FILTERS`. Optionally
+                                         "top": k, "content": bool}             summarized with IPMeta.group_by()
+                                        -> {"count": n, "ips": [...], "report": {...}, "content": {...}}
+        GET  /nearest?lat=X&lon=Y&k=K   {ip: distance_km, ...}
+        GET  /stats                     Database size, cache hits, coalesced requests etc
+        POST /commit                    Save database to disk
+
+Examples:
+    python ipservice.py --port 8765
+    python ipservice.py --unix /tmp/ipdetective.sock
+
+    curl "localhost:8765/lookup?ip=192.168.2.11"
+    curl -d '{"ips": ["192.168.2.11", "2001:db8::1"]}' localhost:8765/lookup
+    curl -d '{"filters": [["kv", "country_name", "United States"]], "group_by": "region_name"}' localhost:8765/filter
+    curl -d '{"filters": [["radius", 39.7392, -104.9903, 50]], "content": true}' localhost:8765/filter
+
+"""
+
+###############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import os
+import sys
+import json
+import signal
+import asyncio
+import argparse
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+import utils
+import ipinfo
+import ipfilter
+
+###### Module Wide Objects
+_here = os.path.dirname(os.path.realpath(__file__))
+logger = utils.logger
+
+## Filter names accepted by POST /filter, and the IPMeta methods they call
+_FILTERS = {"kv": "filter_kv",
+            "ip_list": "filter_ip_list",
+            "ip_range": "filter_ip_range",
+            "prefix": "filter_prefix",
+            "mentions": "filter_mentions",
+            "bbox": "filter_bbox",
+            "radius": "filter_radius"}
+
+###############################################################################
+#                                   Classes
+# ----------*----------*----------*----------*----------*----------*----------*
+class RequestError(Exception):
+    """Bad client request, reported back as a 400 response"""
+
+class IPService(object):
+    """Warm, in-memory IP lookup and filtering service. See module docs for the HTTP API"""
+    def __init__(self, workers=16, store=True):
+        """
+        Kwargs:
+            workers:    Threads for fetching metadata of unknown IPs and running filter queries
+            store:      Store fetched metadata in the database (and commit it on shutdown)
+        """
+        self.db = ipinfo.get_db()
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._inflight = {}         # ip: future of an ongoing fetch
+        self._meta = None           # IPMeta of the database
+        self._new_ips = []          # IPs stored since `_meta` was built, to be merged into it
+        self._meta_lock = None      # asyncio.Lock, made in the serving loop
+        self._commit_lock = None    # asyncio.Lock, so only one commit writes the file at a time
+        self._counts = {"requests": 0, "hits": 0, "fetches": 0, "coalesced": 0, "stored": 0}
+
+    def stats(self):
+        return {"ips": len(self.db.DB), "inflight": len(self._inflight), "committed": self.db.committed,
+                **self._counts, **self.db.DB.stats()}
+
+    ############################ Lookups
+    async def lookup(self, ip):
+        """Metadata {"RDAP":rdap, "GEO":geo} for `ip`, from memory if known, otherwise fetched once"""
+        try:
+            ip = utils.canonical_ip(ip)
+        except ValueError as err:
+            raise RequestError(str(err))
+        if ip in self.db.DB:
+            self._counts["hits"] += 1
+            return self.db.DB[ip]
+
+        pending = self._inflight.get(ip)
+        if pending is None:
+            pending = self._inflight[ip] = asyncio.ensure_future(self._fetch(ip))
+            pending.add_done_callback(lambda _: self._inflight.pop(ip, None))
+        else:
+            self._counts["coalesced"] += 1
+        ## Shielded, so one client going away doesn't cancel the fetch for everybody else
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, ip):
+        self._counts["fetches"] += 1
+        loop = asyncio.get_event_loop()
+        rdap, geo = await loop.run_in_executor(self._executor, ipinfo.ip_lookup, ip)
+        if self.store and (rdap or geo):
+            ## Database is only ever modified here, on the event loop thread
+            self.db.update(ip, rdap=rdap, geo=geo)
+            self._new_ips.append(ip)
+            self._counts["stored"] += 1
+            return self.db.DB[ip]
+        ## Same shape as what the database gives back, `ip` in both GEO and RDAP
+        return {"RDAP": {**rdap, "ip": ip} if rdap else {}, "GEO": {**geo, "ip": ip} if geo else {}}
+
+    async def lookup_many(self, ips):
+        """{ip: metadata} for a batch of IPs, looked up concurrently"""
+        if not isinstance(ips, list):
+            raise RequestError("'ips' must be a list of IP addresses")
+        results = await asyncio.gather(*(self.lookup(ip) for ip in ips))
+        return dict(zip(ips, results))
+
+    ############################ Filtering
+    async def meta(self):
+        """`IPMeta` of the database, built (off the event loop) on first call and updated with newly stored IPs after"""
+        if self._meta_lock is None:
+            self._meta_lock = asyncio.Lock()
+        async with self._meta_lock:
+            if self._meta is None or self._new_ips:
+                ## Snapshot on the event loop thread, the only one that modifies the database. It
+                ## only ever adds IPs, so the snapshot's records can be expanded on a worker thread
+                snapshot = self.db.DB.snapshot()
+                new_ips, self._new_ips = self._new_ips, []
+                loop = asyncio.get_event_loop()
+                try:
+                    self._meta = await loop.run_in_executor(self._executor, self._build_meta, snapshot, self._meta, new_ips)
+                except Exception:
+                    self._new_ips = new_ips + self._new_ips
+                    raise
+        return self._meta
+
+    def _build_meta(self, snapshot, meta=None, new_ips=()):
+        """Build an IPMeta of IPStore `snapshot`, or if there is one already, merge `new_ips` from it into `meta`"""
+        if meta is not None:
+            logger.info(f"Adding {len(new_ips)} IPs to filterable dataset")
+            return meta.merge(ipfilter.IPMeta(data={ip: snapshot[ip] for ip in new_ips}))
+        data = dict(snapshot.items())
+        logger.info(f"Building filterable dataset of {len(data)} IPs")
+        if not data:
+            return ipfilter.IPMeta(df_geo=ipfilter.pd.DataFrame(), df_rdap=ipfilter.pd.DataFrame())
+        return ipfilter.IPMeta(data=data)
+
+    def _query(self, meta, query):
+        """Run a POST /filter `query` against IPMeta `meta`. See module docs"""
+        for step in query.get("filters", []):
+            if not isinstance(step, list) or not step or step[0] not in _FILTERS:
+                raise RequestError(f"Filters must be lists of [method, *args] with method one of {sorted(_FILTERS)}")
+            meta = getattr(meta, _FILTERS[step[0]])(*step[1:])
+
+        ips = list(meta.ips) if "ip" in meta.df_geo.keys() else []
+        result = {"count": len(ips), "ips": ips}
+        if query.get("group_by") is not None:
+            report = meta.group_by(query["group_by"], distinct=query.get("distinct"), top=query.get("top"))
+            result["report"] = {str(key): value for key, value in report.items()}
+        if query.get("content"):
+            result["content"] = meta.content
+        return result
+
+    async def query(self, query):
+        if not isinstance(query, dict):
+            raise RequestError("Filter query must be a JSON object")
+        meta = await self.meta()
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._query, meta, query)
+        except (TypeError, ValueError, KeyError) as err:
+            raise RequestError(f"Bad filter query: {err!r}")
+
+    async def nearest(self, lat, lon, k=10):
+        meta = await self.meta()
+        loop = asyncio.get_event_loop()
+        distances = await loop.run_in_executor(self._executor, meta.nearest, lat, lon, k)
+        return distances.to_dict()
+
+    async def commit(self):
+        """Save the database to disk, writing a snapshot of it on a worker thread"""
+        if self._commit_lock is None:
+            self._commit_lock = asyncio.Lock()
+        async with self._commit_lock:
+            if self.db.committed:
+                return {"committed": True, "ips": len(self.db.DB)}
+            ## IPs stored while the snapshot is being written leave the database uncommitted
+            stored = self._counts["stored"]
+            snapshot = self.db.DB.snapshot()
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(self._executor, utils.store_ip_db, snapshot)
+            if self._counts["stored"] == stored:
+                self.db.committed = True
+            return {"committed": self.db.committed, "ips": len(snapshot)}
+
+    def close(self):
+        """Stop the worker threads (finishing any commit in progress), then commit the database if storing"""
+        self._executor.shutdown(wait=True)
+        if self.store and not self.db.committed:
+            self.db.commit()
+
+    ############################ HTTP
+    async def dispatch(self, method, target, body):
+        """Route one request, returning (HTTPStatus, JSON-able payload)"""
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            payload = json.loads(body.decode("utf-8")) if body else {}
+            if (method, url.path) == ("GET", "/lookup"):
+                ip = params.get("ip")
+                if ip is None:
+                    raise RequestError("Missing 'ip' parameter")
+                return HTTPStatus.OK, {ip: await self.lookup(ip)}
+            if (method, url.path) == ("POST", "/lookup"):
+                return HTTPStatus.OK, await self.lookup_many(payload.get("ips"))
+            if (method, url.path) == ("POST", "/filter"):
+                return HTTPStatus.OK, await self.query(payload)
+            if (method, url.path) == ("GET", "/nearest"):
+                return HTTPStatus.OK, await self.nearest(float(params["lat"]), float(params["lon"]), int(params.get("k", 10)))
+            if (method, url.path) == ("GET", "/stats"):
+                return HTTPStatus.OK, self.stats()
+            if (method, url.path) == ("POST", "/commit"):
+                return HTTPStatus.OK, await self.commit()
+            return HTTPStatus.NOT_FOUND, {"error": f"No endpoint {method} {url.path}"}
+        except (RequestError, ValueError, KeyError, AttributeError) as err:
+            return HTTPStatus.BAD_REQUEST, {"error": str(err)}
+        except Exception as err:
+            logger.exception(f"Error handling {method} {target}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(err)}
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one client connection until it closes"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self._counts["requests"] += 1
+                status, payload = await self.dispatch(method, target, body)
+                data = json.dumps(payload, cls=utils.MyEncoder).encode("utf-8")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write((f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+###############################################################################
+#                                   Functions
+# ----------*----------*----------*----------*----------*----------*----------*
+def serve(host="127.0.0.1", port=8765, unix=None, workers=16, store=True):
+    """Run the service until SIGINT/SIGTERM, then commit the database to disk"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    service = IPService(workers=workers, store=store)
+
+    ## Warm up before accepting clients, so the first filter query doesn't pay for it
+    loop.run_until_complete(service.meta())
+
+    if unix:
+        server = loop.run_until_complete(asyncio.start_unix_server(service.handle, path=unix))
+        logger.info(f"IP lookup service listening on unix socket {unix}")
+    else:
+        server = loop.run_until_complete(asyncio.start_server(service.handle, host, port))
+        logger.info(f"IP lookup service listening on http://{host}:{port}")
+    ## Stop cleanly (committing the database) on SIGTERM as well as Ctrl-C
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, loop.stop)
+        except (NotImplementedError, RuntimeError):
+            pass  # No signal handling on this platform/thread, Ctrl-C still raises KeyboardInterrupt
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Shutting down IP lookup service")
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        service.close()
+        loop.close()
+    return 0
+
+##############################################################################
+#                             Runtime Execution
+# ----------*----------*----------*----------*----------*----------*----------*
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve IP metadata lookups and filter queries over a local HTTP/JSON API',
+                    epilog='Example of use: python ipservice.py --port 8765')
+    parser.add_argument('--host', nargs='?', default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument('--port', nargs='?', default=8765, help="TCP port to listen on")
+    parser.add_argument('--unix', nargs='?', default=None, help="Listen on this unix socket path instead of TCP")
+    parser.add_argument('--workers', nargs='?', default=16, help="Threads for fetching metadata and running queries")
+    parser.add_argument('--store', nargs='?', default=True, help="Save fetched metadata to the database on disk")
+    args = parser.parse_args()
+    utils.setup_logging()
+    store = str(args.store).lower() not in ("false", "0", "no")
+    sys.exit(serve(host=args.host, port=int(args.port), unix=args.unix, workers=int(args.workers), store=store))
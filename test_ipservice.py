@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+__author__ = 'Zach Dischner'
+__copyright__ = ""
+__credits__ = ["NA"]
+__license__ = "NA"
+__version__ = "0.0.0"
+__maintainer__ = "Zach Dischner"
+__email__ = "zach.dischner@gmail.com"
+__status__ = "Dev"
+__doc__ = """
+File name: test_ipservice.py
+Created: Oct 19 2026
+Modified: Oct 19 2026
+
+Summary:
+    Tests for the `ipservice.IPService` lookup service.
+
+Details:
+    Web lookups are replaced by a slow stub and the database lives in a temporary directory,
+    so nothing goes over the network or touches IPDB.json.
+
+Examples:
+    python -m pytest test_ipservice.py
+
+"""
+
+###############################################################################
+#                                   Imports
+# ----------*----------*----------*----------*----------*----------*----------*
+import json
+import time
+import asyncio
+import threading
+import pytest
+import utils
+import ipinfo
+import ipservice
+
+###### Module Wide Objects
+## Country the stubbed web lookup gives each IP, "Testland" for any other
+_COUNTRIES = {"41.202.0.1": "Cote d'Ivoire", "41.202.0.2": "Cote d'Ivoire", "5.1.0.1": "Germany"}
+
+###############################################################################
+#                                   Fixtures
+# ----------*----------*----------*----------*----------*----------*----------*
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """IPService over a fresh, empty database with `ipinfo.ip_lookup` stubbed (calls recorded on `service.calls`)"""
+    monkeypatch.setattr(utils, "_DB_LOC", str(tmp_path / "IPDB.json"))
+    monkeypatch.setattr(utils, "_DB", None)
+    monkeypatch.setattr(utils.IPDB, "DB", None)
+    monkeypatch.setattr(ipinfo, "_db", None)
+
+    calls = []
+    lock = threading.Lock()
+    def ip_lookup(ip, store=False):
+        with lock:
+            calls.append(ip)
+        time.sleep(0.05)
+        return {"handle": "NET-TEST"}, {"ip": ip, "country_name": _COUNTRIES.get(ip, "Testland"), "latitude": 1.0, "longitude": 2.0}
+    monkeypatch.setattr(ipinfo, "ip_lookup", ip_lookup)
+
+    service = ipservice.IPService(workers=4, store=False)
+    service.calls = calls
+    yield service
+    service.close()
+
+
+###############################################################################
+#                                   Tests
+# ----------*----------*----------*----------*----------*----------*----------*
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_concurrent_lookups_coalesce(service):
+    service.store = True
+
+    async def lookups():
+        return await asyncio.gather(*(service.lookup("8.8.8.8") for _ in range(5)))
+
+    results = run(lookups())
+    assert service.calls == ["8.8.8.8"]
+    assert service.stats()["coalesced"] == 4
+    assert all(result["GEO"]["country_name"] == "Testland" for result in results)
+
+    ## Stored, so now answered from memory, the same as when it was fetched
+    assert run(service.lookup("8.8.8.8")) == results[0]
+    assert results[0]["RDAP"] == {"handle": "NET-TEST", "ip": "8.8.8.8"}
+    assert service.calls == ["8.8.8.8"]
+
+
+def test_fetched_without_storing_has_ip_keys(service):
+    result = run(service.lookup("2001:DB8::1"))
+    assert result["GEO"]["ip"] == result["RDAP"]["ip"] == "2001:db8::1"
+    assert "2001:db8::1" not in service.db.DB
+
+
+def test_new_ips_merged_into_filterable_dataset(service):
+    service.store = True
+
+    async def scenario():
+        before = await service.query({})
+        await service.lookup_many(["8.8.8.8", "2001:db8::1"])
+        after = await service.query({"filters": [["kv", "country_name", "Testland"]]})
+        return before, after
+
+    before, after = run(scenario())
+    assert before["count"] == 0
+    assert after["ips"] == ["8.8.8.8", "2001:db8::1"]
+
+
+@pytest.mark.parametrize("method, target, body", [
+    ("GET", "/lookup?ip=not-an-ip", None),
+    ("GET", "/lookup", None),
+    ("POST", "/lookup", {"ips": "8.8.8.8"}),
+    ("POST", "/filter", {"filters": [["bogus", 1]]}),
+    ("POST", "/filter", {"filters": [[]]}),
+    ("POST", "/filter", {"group_by": "/abc"}),
+])
+def test_dispatch_bad_requests(service, method, target, body):
+    status, payload = run(service.dispatch(method, target, json.dumps(body).encode() if body else b""))
+    assert status == 400
+    assert "error" in payload
+    assert service.calls == []
+
+
+def test_dispatch_unknown_endpoint(service):
+    status, payload = run(service.dispatch("GET", "/nope", b""))
+    assert status == 404
+
+
+def test_dispatch_filter_values_are_not_evaluated(service):
+    service.store = True
+
+    async def scenario():
+        await service.lookup_many(["41.202.0.1", "41.202.0.2", "5.1.0.1", "8.8.8.8"])
+        responses = []
+        for value in ["Cote d'Ivoire", "x' or country_name == 'Germany"]:
+            body = json.dumps({"filters": [["kv", "country_name", value]]}).encode()
+            responses.append(await service.dispatch("POST", "/filter", body))
+        return responses
+
+    (status, quoted), (injected_status, injected) = run(scenario())
+    assert status == 200
+    assert quoted["ips"] == ["41.202.0.1", "41.202.0.2"]
+    assert injected_status == 200
+    assert injected["count"] == 0
+
+
+def test_commit_writes_snapshot_off_the_loop(service, monkeypatch):
+    service.store = True
+    store_ip_db = utils.store_ip_db
+    def slow_store_ip_db(db, filename=None):
+        time.sleep(0.2)
+        store_ip_db(db, filename=filename)
+    monkeypatch.setattr(utils, "store_ip_db", slow_store_ip_db)
+
+    async def scenario():
+        await service.lookup("8.8.8.8")
+        ## A lookup stored while the commit is writing leaves the database uncommitted
+        during = await asyncio.gather(service.commit(), service.lookup("9.9.9.9"))
+        return during[0], await service.commit()
+
+    during, after = run(scenario())
+    assert during == {"committed": False, "ips": 1}
+    assert after == {"committed": True, "ips": 2}
+    with open(utils._DB_LOC) as fp:
+        assert list(json.load(fp)) == ["8.8.8.8", "9.9.9.9"]
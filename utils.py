@@ -12,7 +12,7 @@ __status__ = "Dev"
 __doc__ = """
 File name: utils.py
 Created: Mar 29 2017
-Modified: Mar 31 2017
+Modified: Oct 19 2026
 
 Summary:
     Simple module to provide centerpoint definitions for various other modules
@@ -21,6 +21,11 @@ Details:
     Main component here is the `IPDB` class which provides a simplified way to store
     IP address metadata content in an in-memory dictionary and to the disk as a JSON file. 
 
+    In memory, records live in an `IPStore` rather than plain nested dicts: IP keys are
+    integers, strings are interned, GEO records are value tuples sharing one key tuple, and
+    identical RDAP network objects are stored once and shared by every IP in the network.
+    `IPStore` still reads like the {ip: {"GEO":geo, "RDAP":rdap}} dict it replaces.
+
 TODO/Improvements:
     A rework to use the `IPDB` class as a decision point WRT whether or not we need to 
     query the net for metadata would be cool. So far, it is a recieve-only storage interface. 
@@ -34,40 +39,152 @@ import logging
 import os
 import sys
 import json
-from collections import defaultdict
-import numpy as np
+import importlib
+from collections.abc import MutableMapping, ItemsView, ValuesView
 
 log_level = logging.DEBUG
-logging.basicConfig(stream=sys.stdout, level=log_level)
 logger = logging.getLogger("IPDetective")
 
 _here = os.path.dirname(os.path.realpath(__file__))
 _DB_LOC = os.path.join(_here, "IPDB.json")  # Location of stored database file
 _DB = None # Global database dictionary
 
+_V4_MAPPED = 0xFFFF << 32  # IPv4 addresses live in the IPv4-mapped IPv6 block ::ffff:0:0/96
+_U64_MASK = 0xFFFFFFFFFFFFFFFF
+
 ###############################################################################
 #                                   Functions
 # ----------*----------*----------*----------*----------*----------*----------*
+def setup_logging(level=None):
+    """Configure stdout logging for command line runs
+
+    Deliberately not done at import time, so that importing any IPDetective module
+    has no side effects. Each module's `__main__` block calls this instead.
+    """
+    logging.basicConfig(stream=sys.stdout, level=log_level if level is None else level)
+
+def lazy_import(name):
+    """Return a stand-in for module `name` that is only imported on first attribute access
+
+    Keeps heavy dependencies (numpy, pandas, requests) off the startup path of CLIs
+    that never touch them.
+
+    Examples:
+        pd = lazy_import("pandas")    # Nothing imported yet
+        pd.DataFrame()                # pandas imported here
+    """
+    return _LazyModule(name)
+
+def canonical_ip(ip):
+    """Canonical string form of an IPv4/IPv6 address or CIDR block
+
+    IPv6 is compressed and lowercased, IPv4 octets lose leading zeros and CIDR blocks are
+    reduced to their network address. Raises `ValueError` for anything that isn't an address.
+
+    Examples:
+        >>> canonical_ip("2001:0DB8:0000:0000:0000:0000:0000:0001")
+        '2001:db8::1'
+        >>> canonical_ip("010.1.2.3")
+        '10.1.2.3'
+        >>> canonical_ip("192.168.2.11/24")
+        '192.168.2.0/24'
+    """
+    addr, slash, prefix = ip.strip().partition("/")
+    if ":" not in addr:
+        octets = addr.split(".")
+        if len(octets) != 4 or not all(octet.isdigit() for octet in octets):
+            raise ValueError(f"'{ip}' does not appear to be an IPv4 or IPv6 address")
+        addr = ".".join(str(int(octet)) for octet in octets)
+    if slash:
+        return str(ipaddress.ip_network(f"{addr}/{prefix}", strict=False))
+    return str(ipaddress.ip_address(addr))
+
+def ip_span(ip):
+    """First and last addresses covered by an address or CIDR block, as 128 bit integers
+
+    IPv4 is mapped into ::ffff:0:0/96, so an IPv4 address and its IPv4-mapped IPv6 form
+    (1.2.3.4 and ::ffff:102:304) get the same integer. Pair it with the version (see `ip_key`)
+    wherever the two families have to be told apart.
+
+    Examples:
+        >>> ip_span("10.0.0.0/30") == (_V4_MAPPED + 0x0A000000, _V4_MAPPED + 0x0A000003)
+        True
+    """
+    net = ipaddress.ip_network(ip, strict=False)
+    offset = _V4_MAPPED if net.version == 4 else 0
+    return int(net.network_address) + offset, int(net.broadcast_address) + offset
+
+def ip_to_int(ip):
+    """Integer form of an address (first address of a CIDR block). See `ip_span()`"""
+    return ip_span(ip)[0]
+
+def split_ip_int(value):
+    """Split a 128 bit integer address into (high, low) 64 bit halves, for storage in uint64 columns"""
+    return value >> 64, value & _U64_MASK
+
+def ip_key(ip):
+    """Integer key columns for an address or CIDR block: (version, prefixlen, hi, lo)
+
+    Used to index IP metadata for exact, range and prefix lookups. See `ipfilter.IPMeta`
+    """
+    ## Fast path for the common case, a plain dotted IPv4 address
+    octets = ip.split(".") if ":" not in ip and "/" not in ip else ()
+    if len(octets) == 4 and all(octet.isdigit() and int(octet) < 256 for octet in octets):
+        value = _V4_MAPPED + int.from_bytes(bytes(int(octet) for octet in octets), "big")
+        return 4, 32, 0, value
+
+    net = ipaddress.ip_network(ip, strict=False)
+    offset = _V4_MAPPED if net.version == 4 else 0
+    hi, lo = split_ip_int(int(net.network_address) + offset)
+    return net.version, net.prefixlen, hi, lo
+
+def ip_id(ip):
+    """Single integer key for an address or CIDR block: its integer form shifted left 8 bits, plus the prefix length
+
+    Unique across IPv4/IPv6 and addresses/blocks. See `ip_from_id()` for the reverse.
+
+    Examples:
+        >>> ip_from_id(ip_id("10.0.0.0/24")), ip_from_id(ip_id("2001:db8::1"))
+        ('10.0.0.0/24', '2001:db8::1')
+    """
+    version, prefixlen, hi, lo = ip_key(ip)
+    return (((hi << 64) | lo) << 8) | prefixlen
+
+def ip_from_id(key):
+    """Canonical IP string back from an `ip_id()` integer key"""
+    value, prefixlen = key >> 8, key & 0xFF
+    ## IPv4 lives in ::ffff:0:0/96 with a prefix length no IPv6 network there could have
+    if value >> 32 == 0xFFFF and prefixlen == 32:
+        return ".".join(map(str, (value & 0xFFFFFFFF).to_bytes(4, "big")))  # Fast path, a plain IPv4 address
+    if value >> 32 == 0xFFFF and prefixlen < 32:
+        addr, maxlen = ipaddress.IPv4Address(value - _V4_MAPPED), 32
+    else:
+        addr, maxlen = ipaddress.IPv6Address(value), 128
+    return str(addr) if prefixlen == maxlen else f"{addr}/{prefixlen}"
+
 def to_json(data):
     return json.dumps(data, cls=MyEncoder)
 
 def _load_ip_db():
     """Loads a 'database' of stored IP information from a JSON file
 
-    The 'Database' is just a dictionary of the form: {ip_address: {"GEO":geo_json, "RDAP":rdap_json}}. 
-    It is stored as a JSON file. If it doesn't exist, an empty dictionary is returned.
+    The 'Database' is stored as a JSON file of the form: {ip_address: {"GEO":geo_json, "RDAP":rdap_json}}. 
+    It is loaded into a compact `IPStore`. If it doesn't exist, an empty store is returned. If it 
+    exists but can't be read, the error is raised rather than starting over with an empty store
+    that a later `commit()` would write over the file with.
     """
     if os.path.exists(_DB_LOC):
         logger.info(f"Loading serialized ip database from {_DB_LOC}")
         try:
             with open(_DB_LOC, 'rb') as dbfile:
-                return json.load(dbfile)
-        except:
-            logger.error(f"Problem loading IP metadata file from disk {_DB_LOC}. Starting with fresh clean metadata database instead")
-            return defaultdict(dict)
+                data = json.load(dbfile)
+        except (OSError, ValueError):
+            logger.error(f"Problem loading IP metadata file from disk {_DB_LOC}. Fix or move it aside to start a fresh database")
+            raise
+        return IPStore.from_dict(data, consume=True)
     else:
         logger.info("No ip 'database' exists. Starting with a clean fresh one")
-        return defaultdict(dict)
+        return IPStore()
 
 def get_ip_db(reload=False):
     global _DB
@@ -75,30 +192,259 @@ def get_ip_db(reload=False):
         _DB = _load_ip_db()
     return _DB
 
-def store_ip_db(db):
-    logger.info(f"Saving ip database to file {_DB_LOC}. Database has {len(db)} entries in it")
-    with open(_DB_LOC, 'w') as dbfile:
-        json.dump(db, dbfile, indent=2)
+def store_ip_db(db, filename=None):
+    """Save a {ip: metadata} mapping to the database JSON file (or `filename`)
+
+    Written one entry at a time, so an `IPStore` never gets materialized as one big dict
+    """
+    filename = _DB_LOC if filename is None else filename
+    logger.info(f"Saving ip database to file {filename}. Database has {len(db)} entries in it")
+    with open(filename, 'w') as dbfile:
+        dbfile.write("{")
+        for ii, (ip, meta) in enumerate(db.items()):
+            entry = json.dumps(meta, indent=2, cls=MyEncoder).replace("\n", "\n  ")
+            dbfile.write(f"{',' if ii else ''}\n  {json.dumps(ip)}: {entry}")
+        dbfile.write("\n}")
 
 
 def condition_rdap(rdap, ip):
     """Condition and prepare an RDAP data sample for storage
     
-    Doesn't do much for now but keeping as placeholder for good form's sake
+    Doesn't do much for now but keeping as placeholder for good form's sake. The `ip` key
+    is no longer written into the (possibly shared) RDAP object, `IPStore` adds it on read.
     """
-    ## Make sure that the RDAP dictionary at least has the `ip` key
-    rdap["ip"] = ip
+    return rdap
 
-def condition_geo(rdap):
+def condition_geo(geo):
     """Condition and prepare an GEO data sample for storage
 
     Doesn't do anything for now but keeping as placeholder for good form's sake
     """
-    pass
+    return geo
+
+def _intern(obj):
+    """Copy of a parsed JSON object with all dictionary keys and strings interned"""
+    if isinstance(obj, str):
+        return sys.intern(obj)
+    if isinstance(obj, dict):
+        return {sys.intern(key): _intern(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_intern(value) for value in obj]
+    return obj
 
 ###############################################################################
 #                                   Classes
 # ----------*----------*----------*----------*----------*----------*----------*
+class _LazyModule(object):
+    """Module proxy that defers the real import until an attribute is needed. See `lazy_import()`"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            logger.debug(f"Lazily importing {self._name}")
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not yet loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+np = lazy_import("numpy")
+ipaddress = lazy_import("ipaddress")
+
+class _IPRecord(object):
+    """Compact per-IP record held by `IPStore`
+
+    GEO is a tuple of values matching a `geo_keys` tuple shared by all records with the
+    same fields. RDAP is a reference to a deduplicated network object shared across IPs.
+    """
+    __slots__ = ("geo_keys", "geo_values", "rdap")
+
+    def __init__(self):
+        self.geo_keys = ()
+        self.geo_values = ()
+        self.rdap = None
+
+class _IPStoreItems(ItemsView):
+    def __iter__(self):
+        return self._mapping._iter_items()
+
+class _IPStoreValues(ValuesView):
+    def __iter__(self):
+        return (meta for _, meta in self._mapping._iter_items())
+
+class IPStore(MutableMapping):
+    """Memory-compact {ip: {"GEO":geo_dict, "RDAP":rdap_dict}} mapping
+
+    Behaves like the plain dictionary it replaces, but:
+        * IP keys are held as `ip_id()` integers (and given back as canonical strings)
+        * Strings and dictionary keys are interned, so repeated countries, orgs, regions etc.
+          are only stored once
+        * GEO records are value tuples aligned to a shared tuple of keys
+        * Identical RDAP network objects are stored once and shared by every IP in the network
+        * The per-IP `ip` entry is dropped from stored GEO/RDAP and added back on read
+
+    Reads build fresh GEO/RDAP dicts, so modifying them does not change the store; use
+    `set_geo()`/`set_rdap()` or item assignment for that. Nested RDAP lists/dicts in what is
+    read are shared with the store though, so treat them as read only.
+
+    Examples:
+        >>> net = {"handle": "NET-8", "name": "LVLT-ORG-8-8", "ip": "8.8.8.8"}
+        >>> data = {"8.8.8.8": {"GEO": {"ip": "8.8.8.8", "country_code": "US"}, "RDAP": dict(net)},
+        ...         "8.8.4.4": {"GEO": {"ip": "8.8.4.4", "country_code": "US"}, "RDAP": dict(net, ip="8.8.4.4")},
+        ...         "localhost": {"GEO": {}, "RDAP": {}}}
+        >>> store = IPStore.from_dict(data)
+        >>> list(store), len(data)          # Order kept, bad key skipped, `data` untouched
+        (['8.8.8.8', '8.8.4.4'], 3)
+        >>> store["8.8.4.4"] == {"GEO": {"ip": "8.8.4.4", "country_code": "US"},
+        ...                      "RDAP": {"handle": "NET-8", "name": "LVLT-ORG-8-8", "ip": "8.8.4.4"}}
+        True
+        >>> store.stats()["rdap_objects"]    # Identical networks are stored once
+        1
+        >>> store._records[ip_id("8.8.8.8")].rdap is store._records[ip_id("8.8.4.4")].rdap
+        True
+
+        Saved to disk and read back, it is the same dictionary:
+
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as tmp:
+        ...     store_ip_db(store, filename=os.path.join(tmp, "IPDB.json"))
+        ...     with open(os.path.join(tmp, "IPDB.json")) as fp:
+        ...         json.load(fp) == dict(store.items())
+        True
+    """
+    def __init__(self):
+        self._records = {}      # ip_id: _IPRecord
+        self._geo_keys = {}     # key tuple: same key tuple, for sharing among records
+        self._rdap_pool = {}    # content fingerprint: shared RDAP object
+
+    @classmethod
+    def from_dict(cls, data, consume=False):
+        """Build a store from a {ip: {"GEO":geo, "RDAP":rdap}} dictionary, keeping its order
+
+        Keys that aren't IP addresses/CIDR blocks are skipped with a warning.
+
+        Kwargs:
+            consume:    Pop entries from `data` as they are converted, so the fully expanded and
+                        compact forms never have to sit in memory side by side. Empties `data`!
+        """
+        store = cls()
+        for ip in list(data):
+            meta = data.pop(ip) if consume else data[ip]
+            try:
+                store[ip] = meta
+            except ValueError:
+                logger.warning(f"Skipping database entry '{ip}', it is not an IP address or CIDR block")
+        return store
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return (ip_from_id(key) for key in self._records)
+
+    def __contains__(self, ip):
+        try:
+            return ip_id(ip) in self._records
+        except ValueError:
+            return False
+
+    def __getitem__(self, ip):
+        try:
+            key = ip_id(ip)
+            record = self._records[key]
+        except (ValueError, KeyError):
+            raise KeyError(ip)
+        return self._expand(ip_from_id(key), record)
+
+    def items(self):
+        return _IPStoreItems(self)
+
+    def values(self):
+        return _IPStoreValues(self)
+
+    def _iter_items(self):
+        """(ip, metadata) pairs straight off the records, without parsing each IP string back"""
+        for key, record in self._records.items():
+            ip = ip_from_id(key)
+            yield ip, self._expand(ip, record)
+
+    @staticmethod
+    def _expand(ip, record):
+        """Fresh {"GEO":geo, "RDAP":rdap} dictionary for `record`, with canonical `ip` added back"""
+        geo = {}
+        if record.geo_keys:
+            geo = {"ip": ip, **dict(zip(record.geo_keys, record.geo_values))}
+        rdap = {}
+        if record.rdap is not None:
+            rdap = dict(record.rdap)
+            rdap["ip"] = ip
+        return {"GEO": geo, "RDAP": rdap}
+
+    def __setitem__(self, ip, meta):
+        record = self._records[ip_id(ip)] = _IPRecord()
+        self._set_geo(record, meta.get("GEO") or {})
+        self._set_rdap(record, meta.get("RDAP") or None)
+
+    def __delitem__(self, ip):
+        try:
+            del self._records[ip_id(ip)]
+        except ValueError:
+            raise KeyError(ip)
+
+    def _record(self, ip):
+        """Get (creating if needed) the record for `ip`"""
+        key = ip_id(ip)
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = _IPRecord()
+        return record
+
+    def set_geo(self, ip, geo):
+        """Store GEO metadata dictionary `geo` for `ip`"""
+        self._set_geo(self._record(ip), geo)
+
+    def set_rdap(self, ip, rdap):
+        """Store RDAP metadata dictionary `rdap` for `ip`, sharing it with any IP that has identical RDAP data"""
+        self._set_rdap(self._record(ip), rdap)
+
+    def _set_geo(self, record, geo):
+        geo = {key: value for key, value in geo.items() if key != "ip"}
+        keys = tuple(sys.intern(key) for key in geo)
+        record.geo_keys = self._geo_keys.setdefault(keys, keys)
+        record.geo_values = tuple(_intern(value) for value in geo.values())
+
+    def _set_rdap(self, record, rdap):
+        if not rdap:
+            record.rdap = None
+            return
+        rdap = {key: value for key, value in rdap.items() if key != "ip"}
+        fingerprint = hash(json.dumps(rdap, sort_keys=True, cls=MyEncoder))
+        shared = self._rdap_pool.get(fingerprint)
+        if shared is None or shared != rdap:
+            shared = self._rdap_pool[fingerprint] = _intern(rdap)
+        record.rdap = shared
+
+    def snapshot(self):
+        """Read-only copy of the store as it is now, cheap enough to take on a busy thread
+
+        Only the key -> record table is copied (at C speed); records and shared RDAP objects are
+        reused. That is safe for readers on other threads as long as the writer only ever adds new
+        IPs, rather than updating ones already in the snapshot.
+        """
+        snapshot = type(self)()
+        snapshot._records = dict(self._records)
+        snapshot._geo_keys = self._geo_keys
+        snapshot._rdap_pool = self._rdap_pool
+        return snapshot
+
+    def stats(self):
+        """Counts describing how much sharing the store is getting"""
+        return {"ips": len(self._records), "geo_layouts": len(self._geo_keys),
+                "rdap_objects": len(self._rdap_pool)}
+
 class MyEncoder(json.JSONEncoder):
     """Thank you SO! In Python3/numpy, sometimes numbers are stored as or masquerade as
     simple types when really they are big ones that JSON can't serialize. So here's a nice
@@ -117,7 +463,8 @@ class MyEncoder(json.JSONEncoder):
 class IPDB(object):
     """Super basic in memory database of ip information.
 
-    IPDB() objects basically wrap access to a dictionary of stored {ip:{RDAP, GEO}} information.
+    IPDB() objects basically wrap access to a dictionary of stored {ip:{RDAP, GEO}} information,
+    held in memory as a compact `IPStore`.
 
     The data is all stored in-memory until the `commit()` function is called, at which point
     data is saved to disk to a JSON file.
@@ -161,19 +508,17 @@ class IPDB(object):
             ipdb.update("192.168.2.11", rdap=requests.get("https://rdap.arin.net/bootstrap/ip/192.168.2.11").json())
         """
             
-        if IPDB.DB.get(ip) is None:
+        if ip not in IPDB.DB:
             IPDB.DB[ip] = {"GEO":{}, "RDAP":{}}
 
         if rdap is not None:
             logger.debug(f"Updating {ip} RDAP info in database")
-            condition_rdap(rdap, ip)
-            IPDB.DB[ip]["RDAP"] = rdap
+            IPDB.DB.set_rdap(ip, condition_rdap(rdap, ip))
             self.committed = False
 
         if geo is not None:
             logger.debug(f"Updating {ip} GEO info in database")
-            condition_geo(geo)
-            IPDB.DB[ip]["GEO"] = geo
+            IPDB.DB.set_geo(ip, condition_geo(geo))
             self.committed = False
 
     def drop(self,ip):